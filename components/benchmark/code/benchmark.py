@@ -0,0 +1,276 @@
+import os
+# Load the model exactly like inference/app.py does
+os.environ['TF_USE_LEGACY_KERAS'] = '1'
+os.environ['CUDA_VISIBLE_DEVICES'] = '-1'  # Force CPU usage
+
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+
+def current_rss_mb():
+    """
+    Current resident set size of this process in MB (Linux)
+    """
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure_cold_load(model_dir, model_format):
+    """
+    Cold-start cost of one artifact format, run in a fresh process
+
+    Returns TensorFlow import time, model load time and the RSS the model
+    adds on top of TensorFlow.
+    """
+    start = time.perf_counter()
+    import tensorflow as tf
+    import model_artifact
+    import_time = time.perf_counter() - start
+    import_rss = current_rss_mb()
+
+    start = time.perf_counter()
+    if model_format == 'serving':
+        model = model_artifact.load_serving_artifact(model_dir)
+    else:
+        model = tf.keras.models.load_model(Path(model_dir) / 'model.keras')
+    load_time = time.perf_counter() - start
+
+    return {
+        'import_time_s': import_time,
+        'load_time_s': load_time,
+        'model_rss_mb': current_rss_mb() - import_rss,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def compare_formats(model_dir):
+    """
+    Cold-load every available artifact format, each in its own process
+    """
+    import model_artifact
+
+    formats = ['keras']
+    if (Path(model_dir) / model_artifact.SERVING_DESCRIPTOR).exists():
+        formats.append('serving')
+
+    # TensorFlow does not survive fork(); start a clean process per format
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for model_format in formats:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[model_format] = pool.submit(measure_cold_load, str(model_dir), model_format).result()
+    return results
+
+def measure_latency(model, sample, runs, warmup):
+    """
+    Single-sample predict latency percentiles in milliseconds
+    """
+    for _ in range(warmup):
+        model.predict(sample, verbose=0)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model.predict(sample, verbose=0)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return {
+        f'latency_p{p}_ms': float(np.percentile(timings, p))
+        for p in (50, 90, 99)
+    }
+
+def measure_throughput(model, images, batch_size, runs):
+    """
+    Samples per second when predicting batches of `batch_size`
+    """
+    batch = images[:batch_size]
+    model.predict(batch, batch_size=batch_size, verbose=0)
+
+    start = time.perf_counter()
+    for _ in range(runs):
+        model.predict(batch, batch_size=batch_size, verbose=0)
+    elapsed = time.perf_counter() - start
+
+    return runs * len(batch) / elapsed
+
+def check_budgets(report, args):
+    """
+    List of budget violations (empty when the model may be deployed)
+    """
+    budgets = [
+        ('latency_p99_ms', args.max_latency_p99_ms, 'ms'),
+        ('load_time_s', args.max_load_time_s, 's'),
+        ('peak_rss_mb', args.max_memory_mb, 'MB'),
+    ]
+    violations = []
+    for key, limit, unit in budgets:
+        if limit and report[key] > limit:
+            violations.append(f"{key} = {report[key]:.2f} {unit} exceeds budget of {limit} {unit}")
+    return violations
+
+def main(args):
+    """
+    Benchmark the model for serving and gate deployment on budgets
+    """
+    print("=" * 60)
+    print("MNIST Inference Benchmark")
+    print("=" * 60)
+
+    baseline_rss = current_rss_mb()
+
+    # Import and load timed separately: the import is part of every cold start
+    start = time.perf_counter()
+    import tensorflow as tf
+    import model_artifact
+    import_time = time.perf_counter() - start
+    import_rss = current_rss_mb()
+
+    model_path = Path(args.model_input) / 'model.keras'
+    print(f"\nLoading model from {args.model_input}...")
+    start = time.perf_counter()
+    model, model_format = model_artifact.load_model(args.model_input)
+    load_time = time.perf_counter() - start
+    model_rss = current_rss_mb()
+
+    print(f"TensorFlow import: {import_time:.2f} s")
+    print(f"Model load: {load_time:.2f} s (format: {model_format})")
+
+    # Real test images, so the timing matches what the model will see
+    x_test = np.load(Path(args.input_data) / 'x_test.npy')
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+    images = x_test[:max(batch_sizes)]
+
+    print(f"\nMeasuring single-sample latency ({args.latency_runs} runs)...")
+    report = {
+        'import_time_s': import_time,
+        'load_time_s': load_time,
+        **measure_latency(model, images[:1], args.latency_runs, args.warmup_runs)
+    }
+
+    print("Measuring throughput...")
+    for batch_size in batch_sizes:
+        report[f'throughput_bs{batch_size}'] = measure_throughput(
+            model, images, batch_size, args.throughput_runs
+        )
+
+    report.update({
+        'tensorflow_rss_mb': import_rss - baseline_rss,
+        'model_rss_mb': model_rss - import_rss,
+        'peak_rss_mb': peak_rss_mb(),
+        'model_file_mb': model_path.stat().st_size / 1024 / 1024
+    })
+
+    print("\nComparing cold load of each artifact format...")
+    for fmt, result in compare_formats(args.model_input).items():
+        for key, value in result.items():
+            report[f'{fmt}_{key}'] = value
+
+    print("\nResults:")
+    for key, value in report.items():
+        print(f"  {key}: {value:.2f}")
+
+    violations = check_budgets(report, args)
+    report['passed'] = not violations
+
+    output_dir = Path(args.report_output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with open(output_dir / 'benchmark_report.json', 'w') as f:
+        json.dump({'model_format': model_format, 'metrics': report, 'violations': violations}, f, indent=2)
+
+    try:
+        import mlflow
+        mlflow.start_run()
+        mlflow.log_metrics({k: float(v) for k, v in report.items() if k != 'passed'})
+        mlflow.log_param("benchmark_passed", report['passed'])
+        mlflow.log_param("model_format", model_format)
+        mlflow.end_run()
+    except Exception as e:
+        print(f"MLflow not available, continuing without it: {e}")
+
+    if violations:
+        print("\n❌ Model exceeds its serving budgets:")
+        for violation in violations:
+            print(f"  - {violation}")
+        sys.exit(1)
+
+    print("\n✅ Model is within its serving budgets")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trained model for serving")
+
+    parser.add_argument(
+        "--model_input",
+        type=str,
+        required=True,
+        help="Path to the folder containing model.keras"
+    )
+    parser.add_argument(
+        "--input_data",
+        type=str,
+        required=True,
+        help="Path to preprocessed data (x_test.npy is used as input)"
+    )
+    parser.add_argument(
+        "--report_output",
+        type=str,
+        required=True,
+        help="Path to save benchmark_report.json"
+    )
+    parser.add_argument(
+        "--batch_sizes",
+        type=str,
+        default="1,8,32,128",
+        help="Comma separated batch sizes for the throughput measurement"
+    )
+    parser.add_argument(
+        "--latency_runs",
+        type=int,
+        default=200,
+        help="Timed single-sample predictions"
+    )
+    parser.add_argument(
+        "--warmup_runs",
+        type=int,
+        default=20,
+        help="Untimed predictions before measuring latency"
+    )
+    parser.add_argument(
+        "--throughput_runs",
+        type=int,
+        default=20,
+        help="Timed batches per batch size"
+    )
+    parser.add_argument(
+        "--max_latency_p99_ms",
+        type=float,
+        default=0,
+        help="Fail if p99 single-sample latency exceeds this (0 = no budget)"
+    )
+    parser.add_argument(
+        "--max_load_time_s",
+        type=float,
+        default=0,
+        help="Fail if loading the model takes longer than this (0 = no budget)"
+    )
+    parser.add_argument(
+        "--max_memory_mb",
+        type=float,
+        default=0,
+        help="Fail if peak RSS exceeds this (0 = no budget)"
+    )
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,309 @@
+import argparse
+import json
+import shutil
+import time
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+from model_artifact import export_serving_artifact, verify_round_trip
+
+def create_student(input_shape=(28, 28, 1), num_classes=10, filters=(16, 32), dense_units=0):
+    """
+    Create a small CNN student that outputs logits
+
+    Global average pooling replaces the teacher's flatten + 128-unit dense
+    layer, which holds most of the teacher's parameters and FLOPs.
+    """
+    model = keras.Sequential([layers.Input(shape=input_shape)])
+
+    for i, n_filters in enumerate(filters):
+        model.add(layers.Conv2D(n_filters, kernel_size=(3, 3), activation='relu', padding='same'))
+        if i < len(filters) - 1:
+            model.add(layers.MaxPooling2D(pool_size=(2, 2)))
+
+    model.add(layers.GlobalAveragePooling2D())
+    if dense_units:
+        model.add(layers.Dense(dense_units, activation='relu'))
+    model.add(layers.Dense(num_classes))
+
+    return model
+
+def distillation_loss(temperature, alpha):
+    """
+    Loss on y_true = [label, teacher log-probabilities...] and student logits
+
+    alpha weighs the hard-label cross entropy, (1 - alpha) the KL divergence
+    between temperature-softened teacher and student distributions (scaled
+    by T^2 so its gradients stay comparable as T changes).
+    """
+    def loss(y_true, y_pred):
+        labels = tf.cast(y_true[:, 0], tf.int32)
+        teacher_logits = y_true[:, 1:]
+
+        hard = keras.losses.sparse_categorical_crossentropy(labels, y_pred, from_logits=True)
+        soft = keras.losses.kl_divergence(
+            tf.nn.softmax(teacher_logits / temperature),
+            tf.nn.softmax(y_pred / temperature)
+        )
+        return alpha * hard + (1 - alpha) * soft * temperature ** 2
+    return loss
+
+def label_accuracy(y_true, y_pred):
+    """
+    Accuracy against the hard label packed in the first column of y_true
+    """
+    return keras.metrics.sparse_categorical_accuracy(y_true[:, :1], y_pred)
+
+def measure_latency(model, sample, runs=200, warmup=20):
+    """
+    Median and p95 single-sample CPU latency in milliseconds
+    """
+    for _ in range(warmup):
+        model(sample, training=False)
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        model(sample, training=False)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 95))
+
+def describe(name, model, x_test, y_test, latency_runs):
+    """
+    Accuracy, parameter count and CPU latency of a probability-output model
+    """
+    predictions = model.predict(x_test, batch_size=512, verbose=0)
+    accuracy = float(np.mean(np.argmax(predictions, axis=1) == y_test))
+    p50, p95 = measure_latency(model, x_test[:1], runs=latency_runs)
+
+    report = {
+        'accuracy': accuracy,
+        'params': int(model.count_params()),
+        'latency_p50_ms': p50,
+        'latency_p95_ms': p95
+    }
+    print(f"{name}: accuracy={accuracy:.4f}, params={report['params']:,}, "
+          f"latency p50={p50:.2f} ms, p95={p95:.2f} ms")
+    return report
+
+def reloads_cleanly(model, model_path, sample):
+    """
+    Check a saved model loads like the inference server loads it (no
+    custom_objects) and predicts the same as the in-memory model
+    """
+    try:
+        reloaded = keras.models.load_model(model_path)
+    except Exception as e:
+        print(f"Saved model does not load without custom objects: {e}")
+        return False
+
+    expected = model.predict(sample, verbose=0)
+    actual = reloaded.predict(sample, verbose=0)
+    if not np.allclose(expected, actual, atol=1e-5):
+        print(f"Reloaded model predicts differently (max diff {np.abs(expected - actual).max():.2e})")
+        return False
+    return True
+
+def main(args):
+    """
+    Distill the trained teacher CNN into a smaller student model
+    """
+    print("=" * 60)
+    print("MNIST Knowledge Distillation")
+    print("=" * 60)
+
+    try:
+        import mlflow
+        mlflow.start_run()
+    except Exception as e:
+        print(f"MLflow not available, continuing without it: {e}")
+
+    # Load preprocessed data
+    data_path = Path(args.input_data)
+    print(f"\nLoading data from {data_path}...")
+
+    x_train = np.load(data_path / 'x_train.npy')
+    y_train = np.load(data_path / 'y_train.npy')
+    x_test = np.load(data_path / 'x_test.npy')
+    y_test = np.load(data_path / 'y_test.npy')
+
+    # Load teacher and precompute its soft labels once
+    teacher_path = Path(args.teacher_model) / 'model.keras'
+    print(f"\nLoading teacher from {teacher_path}...")
+    teacher = keras.models.load_model(teacher_path)
+
+    print("Computing teacher soft labels...")
+    teacher_probs = teacher.predict(x_train, batch_size=512, verbose=0)
+    teacher_logits = np.log(np.clip(teacher_probs, 1e-7, 1.0))
+    targets = np.concatenate([y_train[:, None].astype('float32'), teacher_logits], axis=1)
+
+    # Create student
+    filters = tuple(int(f) for f in args.student_filters.split(','))
+    print(f"\nCreating student (filters={filters}, dense_units={args.student_dense})...")
+    student = create_student(filters=filters, dense_units=args.student_dense)
+    student.summary()
+
+    student.compile(
+        optimizer=keras.optimizers.Adam(learning_rate=args.learning_rate),
+        loss=distillation_loss(args.temperature, args.alpha),
+        metrics=[label_accuracy]
+    )
+
+    callbacks = [
+        keras.callbacks.EarlyStopping(
+            monitor='val_loss',
+            patience=3,
+            restore_best_weights=True
+        )
+    ]
+
+    print(f"\nTraining student for {args.epochs} epochs...")
+    student.fit(
+        x_train, targets,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        validation_split=0.1,
+        callbacks=callbacks,
+        verbose=1
+    )
+
+    # Serve probabilities like the teacher does. Export an uncompiled copy:
+    # the student's compile config references the distillation loss and
+    # metric, which the inference server could not deserialize
+    serving_student = keras.models.clone_model(student)
+    serving_student.set_weights(student.get_weights())
+    exported = keras.Sequential([serving_student, layers.Softmax()])
+
+    print("\nComparing teacher and student on the test set...")
+    report = {
+        'teacher': describe("Teacher", teacher, x_test, y_test, args.latency_runs),
+        'student': describe("Student", exported, x_test, y_test, args.latency_runs),
+        'tolerance': args.tolerance
+    }
+    accuracy_drop = report['teacher']['accuracy'] - report['student']['accuracy']
+    report['accuracy_drop'] = accuracy_drop
+
+    # Output model.keras is the student if it is accurate enough, else the teacher
+    output_dir = Path(args.model_output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    model_path = output_dir / 'model.keras'
+
+    report['student_accepted'] = False
+    if accuracy_drop <= args.tolerance:
+        print(f"\nStudent within tolerance ({accuracy_drop:.4f} <= {args.tolerance}), exporting it")
+        exported.save(model_path)
+        report['student_accepted'] = reloads_cleanly(exported, model_path, x_test[:256])
+    else:
+        print(f"\nStudent lost {accuracy_drop:.4f} accuracy (> {args.tolerance})")
+
+    if report['student_accepted']:
+        served = exported
+    else:
+        print("Keeping the teacher")
+        shutil.copy(teacher_path, model_path)
+        served = teacher
+    export_serving_artifact(served, output_dir)
+    verify_round_trip(served, output_dir, x_test[:256])
+
+    with open(output_dir / 'distillation_report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+
+    try:
+        import mlflow
+        for name in ('teacher', 'student'):
+            for key, value in report[name].items():
+                mlflow.log_metric(f"{name}_{key}", value)
+        mlflow.log_metric("accuracy_drop", accuracy_drop)
+        mlflow.log_param("student_accepted", report['student_accepted'])
+        mlflow.log_param("student_filters", args.student_filters)
+        mlflow.log_param("temperature", args.temperature)
+        mlflow.log_param("alpha", args.alpha)
+        mlflow.end_run()
+    except Exception as e:
+        print(f"MLflow cleanup: {e}")
+
+    print("\n" + "=" * 60)
+    print("Distillation Complete!")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the MNIST CNN into a smaller student")
+
+    parser.add_argument(
+        "--input_data",
+        type=str,
+        required=True,
+        help="Path to preprocessed data"
+    )
+    parser.add_argument(
+        "--teacher_model",
+        type=str,
+        required=True,
+        help="Path to the training output containing model.keras"
+    )
+    parser.add_argument(
+        "--model_output",
+        type=str,
+        required=True,
+        help="Path to save the model to serve and the distillation report"
+    )
+    parser.add_argument(
+        "--student_filters",
+        type=str,
+        default="16,32",
+        help="Comma separated filters per student convolution"
+    )
+    parser.add_argument(
+        "--student_dense",
+        type=int,
+        default=0,
+        help="Units of an extra dense layer after pooling (0 = none)"
+    )
+    parser.add_argument(
+        "--temperature",
+        type=float,
+        default=4.0,
+        help="Softmax temperature for the soft labels"
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.1,
+        help="Weight of the hard-label loss (the rest goes to soft labels)"
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=10,
+        help="Number of student training epochs"
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=128,
+        help="Batch size for student training"
+    )
+    parser.add_argument(
+        "--learning_rate",
+        type=float,
+        default=0.002,
+        help="Student learning rate"
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.005,
+        help="Maximum test accuracy the student may lose versus the teacher"
+    )
+    parser.add_argument(
+        "--latency_runs",
+        type=int,
+        default=200,
+        help="Timed single-sample predictions per model"
+    )
+
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,147 @@
+import json
+import os
+import re
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+# Callback attributes that make up their between-epoch state
+CALLBACK_STATE = {
+    keras.callbacks.EarlyStopping: ('wait', 'stopped_epoch', 'best', 'best_epoch'),
+    keras.callbacks.ReduceLROnPlateau: ('wait', 'cooldown_counter', 'best'),
+}
+
+def str_to_bool(value):
+    """
+    Parse a command line boolean (Azure ML passes booleans as text)
+    """
+    if isinstance(value, bool):
+        return value
+    return value.strip().lower() in ('1', 'true', 'yes', 'y')
+
+class TrainingCheckpoint(keras.callbacks.Callback):
+    """
+    Periodically checkpoint everything needed to resume training
+
+    Each checkpoint holds the model weights and optimizer state (including
+    the learning rate ReduceLROnPlateau may have lowered) plus a JSON sidecar
+    with the epoch and the state of the tracked callbacks. The sidecar is
+    written last, so a checkpoint without one is treated as incomplete.
+    """
+
+    def __init__(self, save_dir, restore_dir=None, every_n_epochs=1,
+                 max_to_keep=3, tracked_callbacks=None):
+        super().__init__()
+        self.save_dir = Path(save_dir)
+        self.restore_dir = Path(restore_dir or save_dir)
+        self.every_n_epochs = max(every_n_epochs, 1)
+        self.max_to_keep = max_to_keep
+        self.tracked_callbacks = tracked_callbacks or {}
+        self._restored_state = None
+
+    def _checkpoint(self):
+        return tf.train.Checkpoint(model=self.model, optimizer=self.model.optimizer)
+
+    def _sidecars(self, directory):
+        """
+        Completed checkpoints in a directory, newest first, as (epoch, prefix)
+        """
+        if not directory.exists():
+            return []
+        found = []
+        for sidecar in directory.glob('ckpt-*.json'):
+            match = re.fullmatch(r'ckpt-(\d+)\.json', sidecar.name)
+            if match:
+                found.append((int(match.group(1)), directory / f'ckpt-{match.group(1)}'))
+        return sorted(found, reverse=True)
+
+    def restore(self, model):
+        """
+        Restore the latest valid checkpoint into `model`
+
+        Returns the epoch to resume from (0 when nothing was restored). Call
+        this after compiling and before `fit`; callback state is applied when
+        training begins, after the callbacks have reset themselves.
+        """
+        self.set_model(model)
+        for epoch, prefix in self._sidecars(self.restore_dir):
+            try:
+                with open(f'{prefix}.json') as f:
+                    state = json.load(f)
+                self._checkpoint().read(str(prefix)).assert_existing_objects_matched()
+            except Exception as e:
+                print(f"Skipping checkpoint {prefix.name}: {e}")
+                continue
+
+            best_weights_path = Path(f'{prefix}-best_weights.npz')
+            if best_weights_path.exists():
+                with np.load(best_weights_path) as data:
+                    state['best_weights'] = [data[f'arr_{i}'] for i in range(len(data.files))]
+
+            self._restored_state = state
+            print(f"Resumed from checkpoint {prefix.name} (epoch {epoch})")
+            return epoch
+
+        print(f"No valid checkpoint found in {self.restore_dir}, starting fresh")
+        return 0
+
+    def on_train_begin(self, logs=None):
+        if self._restored_state is None:
+            return
+        for name, callback in self.tracked_callbacks.items():
+            for attr, value in self._restored_state['callbacks'].get(name, {}).items():
+                setattr(callback, attr, value)
+            if isinstance(callback, keras.callbacks.EarlyStopping):
+                callback.best_weights = self._restored_state.get('best_weights')
+        self._restored_state = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        completed = epoch + 1
+        if completed % self.every_n_epochs == 0:
+            self.save(completed)
+
+    def save(self, epoch):
+        """
+        Write a checkpoint for `epoch` completed epochs and prune old ones
+        """
+        self.save_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.save_dir / f'ckpt-{epoch}'
+
+        self._checkpoint().write(str(prefix))
+
+        callbacks_state = {}
+        best_weights = None
+        for name, callback in self.tracked_callbacks.items():
+            attrs = CALLBACK_STATE.get(type(callback), ())
+            callbacks_state[name] = {
+                attr: float(getattr(callback, attr)) if attr == 'best' else int(getattr(callback, attr))
+                for attr in attrs
+                if getattr(callback, attr, None) is not None
+            }
+            if getattr(callback, 'best_weights', None) is not None:
+                best_weights = callback.best_weights
+
+        if best_weights is not None:
+            np.savez(f'{prefix}-best_weights.npz', *best_weights)
+
+        # Sidecar goes last and atomically: it marks the checkpoint complete
+        tmp_path = Path(f'{prefix}.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'epoch': epoch, 'callbacks': callbacks_state}, f)
+        os.replace(tmp_path, f'{prefix}.json')
+
+        self._prune()
+
+    def _prune(self):
+        """
+        Keep only the newest `max_to_keep` checkpoints (0 keeps everything)
+        """
+        if self.max_to_keep <= 0:
+            return
+        for _, prefix in self._sidecars(self.save_dir)[self.max_to_keep:]:
+            os.remove(f'{prefix}.json')
+            for path in self.save_dir.glob(f'{prefix.name}.*'):
+                path.unlink()
+            for path in self.save_dir.glob(f'{prefix.name}-*'):
+                path.unlink()
@@ -0,0 +1,129 @@
+import math
+import resource
+import time
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux)
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class ThroughputMonitor(keras.callbacks.Callback):
+    """
+    Measure training throughput and whether the input pipeline keeps up
+
+    Per epoch it reports step time, samples/sec, peak RSS and wall clock,
+    printed and (optionally) logged to MLflow.
+
+    Keras fetches batches inside the compiled training step, so the wait for
+    input cannot be timed from a callback. Instead, when `input_dataset` (the
+    training pipeline *without* its prefetch) is given, the host-side
+    `next()` time of `input_probe_batches` batches is measured after each
+    epoch. `input_time_ms` is the cost of producing one batch; an
+    `input_bound_ratio` near or above 1 means the step has to wait for input.
+    The probe costs `input_probe_batches + 1` batches of host work and memory
+    per epoch; pass a pipeline without a large shuffle buffer, which every
+    new iterator would refill. Peak RSS is read before the probe runs.
+    For a detailed breakdown use the profiler trace: with
+    `profile_steps=(start, stop)` those global steps are traced to
+    `profile_dir` (see the input pipeline analyzer in TensorBoard).
+    """
+
+    def __init__(self, batch_size, num_samples=None, input_dataset=None, input_probe_batches=20,
+                 log_to_mlflow=True, profile_steps=None, profile_dir=None):
+        super().__init__()
+        self.batch_size = batch_size
+        self.num_samples = num_samples
+        self.input_dataset = input_dataset
+        self.input_probe_batches = input_probe_batches
+        self.log_to_mlflow = log_to_mlflow
+        self.profile_steps = profile_steps
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self._global_step = 0
+        self._profiling = False
+
+    def measure_input_time(self):
+        """
+        Mean host-side time to produce one batch, in seconds
+
+        The first batch is skipped: it includes the iterator's start-up cost.
+        """
+        iterator = iter(self.input_dataset.take(self.input_probe_batches + 1))
+        next(iterator, None)
+
+        timings = []
+        for _ in range(self.input_probe_batches):
+            start = time.perf_counter()
+            if next(iterator, None) is None:
+                break
+            timings.append(time.perf_counter() - start)
+        return float(np.mean(timings)) if timings else None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._step_times = []
+
+    def on_train_batch_begin(self, batch, logs=None):
+        if self.profile_steps and self._global_step == self.profile_steps[0]:
+            print(f"\nStarting profiler trace at step {self._global_step}...")
+            tf.profiler.experimental.start(str(self.profile_dir))
+            self._profiling = True
+        self._batch_start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._step_times.append(time.perf_counter() - self._batch_start)
+
+        self._global_step += 1
+        if self._profiling and self._global_step >= self.profile_steps[1]:
+            self._stop_profiler()
+
+    def on_epoch_end(self, epoch, logs=None):
+        epoch_time = time.perf_counter() - self._epoch_start
+        step_times = np.array(self._step_times or [0.0])
+        train_time = step_times.sum()
+
+        # The last batch of an epoch is usually partial
+        samples = len(self._step_times) * self.batch_size
+        if self.num_samples is not None and len(self._step_times) == math.ceil(self.num_samples / self.batch_size):
+            samples = self.num_samples
+
+        metrics = {
+            'epoch_time_s': epoch_time,
+            'step_time_ms': step_times.mean() * 1000,
+            'step_time_p95_ms': np.percentile(step_times, 95) * 1000,
+            'samples_per_sec': samples / train_time if train_time else 0.0,
+            'peak_rss_mb': peak_rss_mb()
+        }
+
+        if self.input_dataset is not None and self.input_probe_batches:
+            input_time = self.measure_input_time()
+            if input_time is not None:
+                metrics['input_time_ms'] = input_time * 1000
+                metrics['input_bound_ratio'] = input_time / step_times.mean() if step_times.mean() else 0.0
+        metrics = {key: float(value) for key, value in metrics.items()}
+
+        print(f"\nEpoch {epoch + 1} throughput: "
+              f"{metrics['samples_per_sec']:.0f} samples/sec, "
+              f"step {metrics['step_time_ms']:.1f} ms, "
+              f"input {metrics.get('input_time_ms', 0.0):.1f} ms/batch, "
+              f"peak RSS {metrics['peak_rss_mb']:.0f} MB")
+
+        if self.log_to_mlflow:
+            try:
+                import mlflow
+                mlflow.log_metrics(metrics, step=epoch + 1)
+            except Exception as e:
+                print(f"MLflow logging skipped: {e}")
+
+    def on_train_end(self, logs=None):
+        if self._profiling:
+            self._stop_profiler()
+
+    def _stop_profiler(self):
+        tf.profiler.experimental.stop()
+        self._profiling = False
+        print(f"\nProfiler trace written to {self.profile_dir}")
@@ -0,0 +1,95 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+def find_free_ports(count):
+    """
+    Reserve `count` free localhost ports for the worker cluster
+    """
+    sockets = []
+    for _ in range(count):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('localhost', 0))
+        sockets.append(sock)
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+def main(args, train_args):
+    """
+    Launch several train.py workers on this machine, one TF_CONFIG each
+    """
+    ports = find_free_ports(args.num_workers)
+    cluster = {'worker': [f'localhost:{port}' for port in ports]}
+    train_script = Path(__file__).parent / 'train.py'
+
+    threads = args.threads_per_worker or max(1, (os.cpu_count() or 1) // args.num_workers)
+
+    print(f"Launching {args.num_workers} workers: {cluster['worker']}")
+    print(f"Threads per worker: {threads}")
+
+    processes = []
+    for index in range(args.num_workers):
+        env = os.environ.copy()
+        env['TF_CONFIG'] = json.dumps({
+            'cluster': cluster,
+            'task': {'type': 'worker', 'index': index}
+        })
+        # Keep each worker on CPU, with its share of the cores
+        env['CUDA_VISIBLE_DEVICES'] = '-1'
+        env['TF_NUM_INTRAOP_THREADS'] = str(threads)
+        env['TF_NUM_INTEROP_THREADS'] = '1'
+        env['OMP_NUM_THREADS'] = str(threads)
+        processes.append(subprocess.Popen(
+            [sys.executable, str(train_script), *train_args], env=env
+        ))
+
+    # A crashed worker leaves the others blocked in collectives: stop them all
+    exit_codes = [None] * len(processes)
+    while None in exit_codes:
+        for index, process in enumerate(processes):
+            if exit_codes[index] is None:
+                exit_codes[index] = process.poll()
+        failed = [i for i, code in enumerate(exit_codes) if code not in (None, 0)]
+        if failed:
+            print(f"Worker {failed[0]} failed, stopping the other workers...")
+            for process in processes:
+                if process.poll() is None:
+                    process.terminate()
+            for process in processes:
+                process.wait()
+            break
+        time.sleep(0.5)
+
+    for index, process in enumerate(processes):
+        print(f"Worker {index} exited with code {process.returncode}")
+
+    # Report the first failure, not the SIGTERM of the workers we stopped
+    return next((code for code in exit_codes if code not in (None, 0)), 0)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run multi-worker MNIST training locally",
+        epilog="Any remaining arguments are passed to train.py"
+    )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=2,
+        help="Number of worker processes to launch"
+    )
+    parser.add_argument(
+        "--threads_per_worker",
+        type=int,
+        default=0,
+        help="TensorFlow intra-op threads per worker (0 = split the cores evenly)"
+    )
+
+    args, train_args = parser.parse_known_args()
+    sys.exit(main(args, train_args))
@@ -0,0 +1,295 @@
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+def parse_list(cast):
+    """
+    Argparse type for comma separated lists, e.g. "64,128,256"
+    """
+    def parse(value):
+        return [cast(item) for item in value.split(',') if item.strip()]
+    return parse
+
+def build_trials(args):
+    """
+    Trial configurations: the batch size x learning rate grid, sampled down
+    to --num_trials when that is smaller than the grid
+    """
+    grid = [
+        {'batch_size': batch_size, 'learning_rate': learning_rate}
+        for batch_size, learning_rate in itertools.product(args.batch_sizes, args.learning_rates)
+    ]
+    if args.num_trials and args.num_trials < len(grid):
+        grid = random.Random(args.seed).sample(grid, args.num_trials)
+    return [dict(config, trial_id=i) for i, config in enumerate(grid)]
+
+def rung_budgets(min_epochs, max_epochs, reduction_factor):
+    """
+    Cumulative epochs trained at each rung: min_epochs * eta^k, up to max_epochs
+    """
+    budgets = []
+    budget = min_epochs
+    while budget < max_epochs:
+        budgets.append(budget)
+        budget *= reduction_factor
+    budgets.append(max_epochs)
+    return budgets
+
+def run_trial(trial, input_data, trial_dir, initial_epoch, epochs, threads):
+    """
+    Train one trial from `initial_epoch` up to `epochs` in a worker process
+
+    The model (with optimizer state) is saved in the trial directory after
+    every rung, so a promoted trial continues where it stopped.
+    """
+    os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
+    import numpy as np
+    import tensorflow as tf
+    from tensorflow import keras
+    from train import create_model
+
+    # Share the CPU between the trials running side by side
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(1)
+
+    data_path = Path(input_data)
+    x_train = np.load(data_path / 'x_train.npy', mmap_mode='r')
+    y_train = np.load(data_path / 'y_train.npy', mmap_mode='r')
+
+    model_path = Path(trial_dir) / 'model.keras'
+    if initial_epoch > 0 and model_path.exists():
+        model = keras.models.load_model(model_path)
+    else:
+        model = create_model()
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=trial['learning_rate']),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
+
+    history = model.fit(
+        x_train, y_train,
+        batch_size=trial['batch_size'],
+        epochs=epochs,
+        initial_epoch=initial_epoch,
+        validation_split=0.1,
+        verbose=0
+    )
+
+    Path(trial_dir).mkdir(parents=True, exist_ok=True)
+    model.save(model_path)
+
+    return {
+        'trial_id': trial['trial_id'],
+        'epochs': epochs,
+        'history': {key: [float(v) for v in values] for key, values in history.history.items()},
+        'val_loss': float(history.history['val_loss'][-1]),
+        'val_accuracy': float(history.history['val_accuracy'][-1])
+    }
+
+def log_trial_result(run_ids, result, initial_epoch):
+    """
+    Log a rung's per-epoch metrics to the trial's nested MLflow run
+    """
+    try:
+        import mlflow
+        with mlflow.start_run(run_id=run_ids[result['trial_id']], nested=True):
+            for key, values in result['history'].items():
+                for offset, value in enumerate(values):
+                    mlflow.log_metric(key, value, step=initial_epoch + offset + 1)
+    except Exception as e:
+        print(f"MLflow logging skipped for trial {result['trial_id']}: {e}")
+
+def main(args):
+    """
+    Successive-halving hyperparameter sweep over batch size and learning rate
+    """
+    print("=" * 60)
+    print("MNIST Hyperparameter Sweep (successive halving)")
+    print("=" * 60)
+
+    output_dir = Path(args.model_output)
+    trials_dir = output_dir / 'trials'
+    trials_dir.mkdir(parents=True, exist_ok=True)
+
+    trials = build_trials(args)
+    budgets = rung_budgets(args.min_epochs, args.epochs, args.reduction_factor)
+    threads = max(1, (os.cpu_count() or 1) // args.max_workers)
+    print(f"\nTrials: {len(trials)}")
+    print(f"Rung budgets (epochs): {budgets}")
+    print(f"Workers: {args.max_workers} x {threads} threads")
+
+    run_ids = {}
+    try:
+        import mlflow
+        mlflow.start_run()
+        mlflow.log_param("num_trials", len(trials))
+        mlflow.log_param("rung_budgets", budgets)
+        mlflow.log_param("reduction_factor", args.reduction_factor)
+        for trial in trials:
+            with mlflow.start_run(run_name=f"trial-{trial['trial_id']}", nested=True) as run:
+                mlflow.log_params({k: v for k, v in trial.items() if k != 'trial_id'})
+                run_ids[trial['trial_id']] = run.info.run_id
+    except Exception as e:
+        print(f"MLflow not available, continuing without it: {e}")
+
+    survivors = trials
+    trained_epochs = {trial['trial_id']: 0 for trial in trials}
+    results = {}
+    total_epochs = 0
+
+    # TensorFlow does not survive fork(); start clean worker processes
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=args.max_workers, mp_context=context) as pool:
+        for rung, budget in enumerate(budgets):
+            print(f"\nRung {rung}: training {len(survivors)} trials to {budget} epochs...")
+            futures = [
+                pool.submit(
+                    run_trial, trial, args.input_data,
+                    str(trials_dir / f"trial-{trial['trial_id']}"),
+                    trained_epochs[trial['trial_id']], budget, threads
+                )
+                for trial in survivors
+            ]
+            for trial, future in zip(survivors, futures):
+                result = future.result()
+                if run_ids:
+                    log_trial_result(run_ids, result, trained_epochs[trial['trial_id']])
+                total_epochs += budget - trained_epochs[trial['trial_id']]
+                trained_epochs[trial['trial_id']] = budget
+                results[trial['trial_id']] = result
+                print(f"  trial {trial['trial_id']} (batch_size={trial['batch_size']}, "
+                      f"learning_rate={trial['learning_rate']}): "
+                      f"val_accuracy={result['val_accuracy']:.4f}")
+
+            # Promote the best 1/eta of this rung, stop the rest
+            if rung < len(budgets) - 1:
+                ranked = sorted(survivors, key=lambda t: results[t['trial_id']]['val_accuracy'], reverse=True)
+                keep = max(1, math.ceil(len(ranked) / args.reduction_factor))
+                survivors = ranked[:keep]
+                print(f"  promoting trials {[t['trial_id'] for t in survivors]}")
+
+    best = max(survivors, key=lambda t: results[t['trial_id']]['val_accuracy'])
+    best_result = results[best['trial_id']]
+    grid_epochs = len(trials) * args.epochs
+
+    print(f"\nBest trial: {best['trial_id']}")
+    print(f"Batch size: {best['batch_size']}")
+    print(f"Learning rate: {best['learning_rate']}")
+    print(f"Validation accuracy: {best_result['val_accuracy']:.4f}")
+    print(f"Epochs trained: {total_epochs} (full grid: {grid_epochs}, "
+          f"{total_epochs / grid_epochs:.0%})")
+
+    # Best model and configuration go where the training step would put them
+    shutil.copy(trials_dir / f"trial-{best['trial_id']}" / 'model.keras', output_dir / 'model.keras')
+    with open(output_dir / 'best_config.json', 'w') as f:
+        json.dump({
+            'batch_size': best['batch_size'],
+            'learning_rate': best['learning_rate'],
+            'epochs': args.epochs,
+            'val_accuracy': best_result['val_accuracy'],
+            'val_loss': best_result['val_loss']
+        }, f, indent=2)
+
+    try:
+        import mlflow
+        mlflow.log_params({f"best_{k}": v for k, v in best.items() if k != 'trial_id'})
+        mlflow.log_metric("best_val_accuracy", best_result['val_accuracy'])
+        mlflow.log_metric("sweep_epochs", total_epochs)
+        mlflow.log_metric("sweep_compute_fraction", total_epochs / grid_epochs)
+        mlflow.end_run()
+    except Exception as e:
+        print(f"MLflow cleanup: {e}")
+
+    if not args.keep_trials:
+        shutil.rmtree(trials_dir, ignore_errors=True)
+
+    print("\n" + "=" * 60)
+    print("Sweep Complete!")
+    print("=" * 60)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the MNIST CNN")
+
+    parser.add_argument(
+        "--input_data",
+        type=str,
+        required=True,
+        help="Path to preprocessed data"
+    )
+    parser.add_argument(
+        "--model_output",
+        type=str,
+        required=True,
+        help="Path to save the best model and configuration"
+    )
+    parser.add_argument(
+        "--epochs",
+        type=int,
+        default=15,
+        help="Maximum epochs for a trial that survives every rung"
+    )
+    parser.add_argument(
+        "--min_epochs",
+        type=int,
+        default=1,
+        help="Epochs every trial gets before the first cut"
+    )
+    parser.add_argument(
+        "--reduction_factor",
+        type=int,
+        default=3,
+        help="Keep the best 1/N trials at each rung"
+    )
+    parser.add_argument(
+        "--batch_sizes",
+        type=parse_list(int),
+        default=[64, 128, 256],
+        help="Comma separated batch sizes to try"
+    )
+    parser.add_argument(
+        "--learning_rates",
+        type=parse_list(float),
+        default=[0.0003, 0.001, 0.003],
+        help="Comma separated learning rates to try"
+    )
+    parser.add_argument(
+        "--num_trials",
+        type=int,
+        default=0,
+        help="Randomly sample this many configurations from the grid (0 = all)"
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=max(1, (os.cpu_count() or 1) // 2),
+        help="Number of trials trained in parallel"
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=42,
+        help="Seed for sampling configurations"
+    )
+    parser.add_argument(
+        "--keep_trials",
+        action="store_true",
+        help="Keep every trial's model in model_output/trials"
+    )
+
+    args = parser.parse_args()
+    # Each rung must be longer than the last, or the schedule never ends
+    if args.reduction_factor < 2:
+        parser.error("--reduction_factor must be at least 2")
+    if not 1 <= args.min_epochs <= args.epochs:
+        parser.error("--min_epochs must be between 1 and --epochs")
+    if args.max_workers < 1:
+        parser.error("--max_workers must be at least 1")
+    main(args)
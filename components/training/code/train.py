@@ -1,5 +1,8 @@
 import argparse
+import json
 import os
+import shutil
+import tempfile
 from pathlib import Path
 import numpy as np
 import tensorflow as tf
@@ -7,6 +10,9 @@ from tensorflow import keras
 from tensorflow.keras import layers
 import mlflow
 import mlflow.tensorflow
+from checkpointing import TrainingCheckpoint, str_to_bool
+from instrumentation import ThroughputMonitor
+from model_artifact import export_serving_artifact, verify_round_trip
 
 def create_model(input_shape=(28, 28, 1), num_classes=10):
     """
@@ -33,6 +39,75 @@ def create_model(input_shape=(28, 28, 1), num_classes=10):
     
     return model
 
+def get_distribution_strategy():
+    """
+    Pick a distribution strategy from the cluster described in TF_CONFIG
+
+    Azure ML sets TF_CONFIG for every process of a `tensorflow` distributed
+    job; the local launcher (launch_workers.py) does the same. Without a
+    multi-worker cluster we fall back to the default single-process strategy.
+    """
+    tf_config = json.loads(os.environ.get('TF_CONFIG', '{}'))
+    cluster = tf_config.get('cluster', {})
+    num_workers = len(cluster.get('chief', [])) + len(cluster.get('worker', []))
+    
+    if num_workers > 1:
+        strategy = tf.distribute.MultiWorkerMirroredStrategy()
+    else:
+        strategy = tf.distribute.get_strategy()
+    
+    task = tf_config.get('task', {})
+    task_type = task.get('type', 'worker')
+    task_id = int(task.get('index', 0))
+    
+    return strategy, max(num_workers, 1), cluster, task_type, task_id
+
+def is_chief_worker(cluster, task_type, task_id):
+    """
+    The chief is the explicit `chief` task, or worker 0 when there is none
+    """
+    if task_type == 'chief':
+        return True
+    return 'chief' not in cluster and task_type == 'worker' and task_id == 0
+
+def worker_output_dir(output_dir, is_chief):
+    """
+    Directory a worker should write collective saves to
+
+    Every worker has to take part in saving a distributed model, but only
+    the chief writes to the real output; the others write to a scratch dir.
+    """
+    if is_chief:
+        return Path(output_dir)
+    return Path(tempfile.mkdtemp(prefix='worker-'))
+
+def make_dataset(x, y, global_batch_size, shuffle=False, prefetch=True):
+    """
+    Build a batched tf.data pipeline sharded by data across workers
+    """
+    dataset = tf.data.Dataset.from_tensor_slices((x, y))
+    if shuffle:
+        dataset = dataset.shuffle(len(x), seed=42, reshuffle_each_iteration=True)
+    dataset = dataset.batch(global_batch_size)
+    if prefetch:
+        dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    
+    options = tf.data.Options()
+    options.experimental_distribute.auto_shard_policy = (
+        tf.data.experimental.AutoShardPolicy.DATA
+    )
+    return dataset.with_options(options)
+
+def parse_step_range(value):
+    """
+    Argparse type for a START,STOP pair of global steps, e.g. "20,40"
+    """
+    try:
+        start, stop = (int(step) for step in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected START,STOP, got '{value}'")
+    return start, stop
+
 def main(args):
     """
     Train MNIST digit classification model
@@ -41,12 +116,32 @@ def main(args):
     print("MNIST Digit Classifier Training")
     print("=" * 60)
     
-    # Simple MLflow setup - just basic logging
-    try:
-        import mlflow
-        mlflow.start_run()
-    except Exception as e:
-        print(f"MLflow not available, continuing without it: {e}")
+    # Distribution setup - TF_CONFIG decides single or multi-worker
+    strategy, num_workers, cluster, task_type, task_id = get_distribution_strategy()
+    is_chief = is_chief_worker(cluster, task_type, task_id)
+    print(f"\nWorkers: {num_workers} (this is {task_type} {task_id}"
+          f"{', chief' if is_chief else ''})")
+    
+    # Scale batch size and learning rate linearly with the number of workers
+    global_batch_size = args.batch_size * num_workers
+    learning_rate = args.learning_rate * num_workers
+    print(f"Global batch size: {global_batch_size}")
+    print(f"Learning rate: {learning_rate}")
+    
+    # Every worker saves, only the chief writes to the real output directory
+    output_dir = worker_output_dir(args.model_output, is_chief)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    # Simple MLflow setup - just basic logging, chief only
+    if is_chief:
+        try:
+            import mlflow
+            mlflow.start_run()
+            mlflow.log_param("num_workers", num_workers)
+            mlflow.log_param("global_batch_size", global_batch_size)
+            mlflow.log_param("scaled_learning_rate", learning_rate)
+        except Exception as e:
+            print(f"MLflow not available, continuing without it: {e}")
     
     # Load preprocessed data
     data_path = Path(args.input_data)
@@ -61,80 +156,123 @@ def main(args):
     print(f"Test samples: {len(x_test)}")
     print(f"Image shape: {x_train.shape[1:]}")
     
-    # Create model
+    # Hold out the last 10% for validation (same as validation_split=0.1)
+    split = int(len(x_train) * 0.9)
+    train_dataset = make_dataset(x_train[:split], y_train[:split], global_batch_size, shuffle=True)
+    # Same pipeline without shuffle and prefetch, for the input cost probe:
+    # a second full-size shuffle buffer would cost more than it measures
+    probe_dataset = make_dataset(x_train[:split], y_train[:split], global_batch_size, prefetch=False)
+    val_dataset = make_dataset(x_train[split:], y_train[split:], global_batch_size)
+    test_dataset = make_dataset(x_test, y_test, global_batch_size)
+    
+    # Throughput and input-stall metrics, profiler trace on the chief only
+    profile_steps = args.profile_steps if is_chief else None
+    monitor = ThroughputMonitor(
+        batch_size=global_batch_size,
+        num_samples=split,
+        input_dataset=probe_dataset,
+        log_to_mlflow=is_chief,
+        profile_steps=profile_steps,
+        profile_dir=output_dir / 'profile'
+    )
+    
+    # Create and compile model inside the strategy scope
     print("\nCreating model...")
-    model = create_model()
+    with strategy.scope():
+        model = create_model()
+        
+        print("\nCompiling model...")
+        model.compile(
+            optimizer=keras.optimizers.Adam(learning_rate=learning_rate),
+            loss='sparse_categorical_crossentropy',
+            metrics=['accuracy']
+        )
     model.summary()
     
-    # Compile model
-    print("\nCompiling model...")
-    model.compile(
-        optimizer=keras.optimizers.Adam(learning_rate=args.learning_rate),
-        loss='sparse_categorical_crossentropy',
-        metrics=['accuracy']
+    # Set up callbacks
+    early_stopping = keras.callbacks.EarlyStopping(
+        monitor='val_loss',
+        patience=5,
+        restore_best_weights=True
     )
+    reduce_lr = keras.callbacks.ReduceLROnPlateau(
+        monitor='val_loss',
+        factor=0.5,
+        patience=3,
+        min_lr=1e-7
+    )
+    # Checkpoints are read from the chief's directory on every worker
+    checkpoint = TrainingCheckpoint(
+        save_dir=output_dir / 'checkpoints',
+        restore_dir=Path(args.model_output) / 'checkpoints',
+        every_n_epochs=args.checkpoint_every,
+        max_to_keep=args.keep_checkpoints,
+        tracked_callbacks={
+            'early_stopping': early_stopping,
+            'reduce_lr': reduce_lr
+        }
+    )
+    # Checkpoint last so it restores callback state after they reset
+    callbacks = [monitor, early_stopping, reduce_lr, checkpoint]
     
-    # Set up callbacks
-    callbacks = [
-        keras.callbacks.EarlyStopping(
-            monitor='val_loss',
-            patience=5,
-            restore_best_weights=True
-        ),
-        keras.callbacks.ReduceLROnPlateau(
-            monitor='val_loss',
-            factor=0.5,
-            patience=3,
-            min_lr=1e-7
-        )
-    ]
+    initial_epoch = 0
+    if args.resume:
+        print("\nLooking for a checkpoint to resume from...")
+        initial_epoch = checkpoint.restore(model)
     
     # Train model
     print(f"\nTraining model for {args.epochs} epochs...")
     history = model.fit(
-        x_train, y_train,
-        batch_size=args.batch_size,
+        train_dataset,
         epochs=args.epochs,
-        validation_split=0.1,
+        initial_epoch=initial_epoch,
+        validation_data=val_dataset,
         callbacks=callbacks,
-        verbose=1
+        verbose=1 if is_chief else 0
     )
     
     # Evaluate model
     print("\nEvaluating model on test set...")
-    test_loss, test_accuracy = model.evaluate(x_test, y_test, verbose=0)
+    test_loss, test_accuracy = model.evaluate(test_dataset, verbose=0)
     
     print(f"\nFinal Results:")
     print(f"Test Loss: {test_loss:.4f}")
     print(f"Test Accuracy: {test_accuracy:.4f}")
     
     # Log final metrics if MLflow is available
-    try:
-        import mlflow
-        mlflow.log_metric("test_loss", test_loss)
-        mlflow.log_metric("test_accuracy", test_accuracy)
-    except:
-        pass
-    
-    # Save model
-    # Save model
-    output_dir = Path(args.model_output)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    if is_chief:
+        try:
+            import mlflow
+            mlflow.log_metric("test_loss", test_loss)
+            mlflow.log_metric("test_accuracy", test_accuracy)
+        except:
+            pass
+    
+    # Save model - every worker saves, only the chief keeps it
     model_path = output_dir / 'model.keras'
     
     print(f"\nSaving model to {model_path}...")
     model.save(model_path)
     
-    print(f"Model saved successfully!")
-    print(f"Model file size: {model_path.stat().st_size / 1024 / 1024:.2f} MB")
+    if is_chief:
+        print(f"Model saved successfully!")
+        print(f"Model file size: {model_path.stat().st_size / 1024 / 1024:.2f} MB")
+        
+        # Fast-loading artifact the inference server prefers over model.keras
+        descriptor_path = export_serving_artifact(model, output_dir)
+        verify_round_trip(model, output_dir, x_test[:256])
+        print(f"Serving artifact saved to {descriptor_path}")
+    else:
+        shutil.rmtree(output_dir, ignore_errors=True)
     
     # End MLflow run if it was started
-    try:
-        import mlflow
-        mlflow.autolog(disable=True)
-        mlflow.end_run()
-    except Exception as e:
-        print(f"MLflow cleanup: {e}")
+    if is_chief:
+        try:
+            import mlflow
+            mlflow.autolog(disable=True)
+            mlflow.end_run()
+        except Exception as e:
+            print(f"MLflow cleanup: {e}")
     
     print("\n" + "=" * 60)
     print("Training Complete!")
@@ -165,14 +303,42 @@ if __name__ == "__main__":
         "--batch_size",
         type=int,
         default=128,
-        help="Batch size for training"
+        help="Batch size per worker (scaled by the number of workers)"
     )
     parser.add_argument(
         "--learning_rate",
         type=float,
         default=0.001,
-        help="Learning rate"
+        help="Learning rate for one worker (scaled by the number of workers)"
+    )
+    parser.add_argument(
+        "--checkpoint_every",
+        type=int,
+        default=1,
+        help="Save a training checkpoint every N epochs"
+    )
+    parser.add_argument(
+        "--keep_checkpoints",
+        type=int,
+        default=3,
+        help="Number of checkpoints to keep (0 keeps all)"
+    )
+    parser.add_argument(
+        "--resume",
+        type=str_to_bool,
+        nargs="?",
+        const=True,
+        default=False,
+        help="Resume from the latest valid checkpoint in the model output"
+    )
+    parser.add_argument(
+        "--profile_steps",
+        type=parse_step_range,
+        default=None,
+        help="Write a profiler trace for global steps START,STOP (e.g. 20,40)"
     )
     
     args = parser.parse_args()
+    if args.profile_steps and not 0 <= args.profile_steps[0] < args.profile_steps[1]:
+        parser.error("--profile_steps needs 0 <= START < STOP")
     main(args)
@@ -4,13 +4,87 @@ os.environ['CUDA_VISIBLE_DEVICES'] = '-1'  # Force CPU usage
 
 from fastapi import FastAPI, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from pydantic import BaseModel
 import tensorflow as tf
 import numpy as np
 from PIL import Image
 import io
 import base64
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import model_artifact
+from image_decode import ImageTooLarge, decode_digit
+
+# Upload limits for /predict (a few large photos must not OOM a 1Gi pod)
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_MB', '10')) * 1024 * 1024
+MAX_IMAGE_PIXELS = int(os.environ.get('MAX_IMAGE_PIXELS', '25000000'))
+DECODE_WORKERS = int(os.environ.get('DECODE_WORKERS', '1'))
+UPLOAD_CHUNK_BYTES = 64 * 1024
+# Room for the multipart boundaries and headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 16 * 1024
+
+def upload_too_large():
+    return JSONResponse(status_code=413, content={
+        "success": False,
+        "error": f"Upload too large (max {MAX_UPLOAD_BYTES // (1024 * 1024)} MB)"
+    })
+
+class UploadTooLarge(Exception):
+    """Raised while receiving a /predict request body that is over the limit"""
+
+class LimitUploadSize:
+    """
+    ASGI middleware that answers oversized /predict uploads with 413
+
+    Content-Length is checked before anything is read, and the body is counted
+    while it is received, so chunked or mislabelled uploads are cut off at the
+    limit instead of being spooled in full.
+    """
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] != '/predict':
+            return await self.app(scope, receive, send)
+
+        content_length = dict(scope['headers']).get(b'content-length', b'')
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            return await upload_too_large()(scope, receive, send)
+
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    too_large = True
+                    raise UploadTooLarge()
+            return message
+
+        async def limited_send(message):
+            nonlocal response_started
+            if too_large:
+                # The app answers the cut-off body with an error; send 413 instead
+                if message['type'] == 'http.response.start' and not response_started:
+                    response_started = True
+                    await upload_too_large()(scope, receive, send)
+                return
+            response_started = response_started or message['type'] == 'http.response.start'
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except UploadTooLarge:
+            if not response_started:
+                await upload_too_large()(scope, receive, send)
 
 # Create FastAPI app
 app = FastAPI(
@@ -19,6 +93,9 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Reject oversized uploads; added first so CORS headers still wrap the 413
+app.add_middleware(LimitUploadSize, max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -31,40 +108,72 @@ app.add_middleware(
 # Global model variable
 model = None
 model_loaded = False
+model_format = None
+
+# Process pool for image decoding, created on startup
+decode_pool = None
 
 class DrawingData(BaseModel):
     image: str  # base64 encoded image
 
 def load_model():
     """Load the model from the local filesystem - ONLY ONCE"""
-    global model, model_loaded
+    global model, model_loaded, model_format
     
     # Check if already loaded
     if model_loaded and model is not None:
         return model
     
     # Model will be copied here during Docker build
-    model_path = './model/model.keras'
-    
-    print(f"Loading model from {model_path}...")
+    model_dir = './model'
     
-    if not os.path.exists(model_path):
-        print(f"ERROR: Model not found at {model_path}")
-        raise FileNotFoundError(f"Model file not found at {model_path}")
+    print(f"Loading model from {model_dir}...")
     
     try:
-        # Load WITHOUT compiling (fixes TF version mismatch)
-        model = tf.keras.models.load_model(model_path)
+        # Prefer the mmap-able serving artifact, fall back to model.keras
+        model, model_format = model_artifact.load_model(model_dir)
         model_loaded = True
-        print("Model loaded successfully!")
+        print(f"Model loaded successfully! (format: {model_format})")
         return model
     except Exception as e:
         print(f"Error loading model: {e}")
         raise
 
+def create_decode_pool():
+    # spawn, not fork: workers only import image_decode, not TensorFlow
+    return ProcessPoolExecutor(
+        max_workers=DECODE_WORKERS,
+        mp_context=multiprocessing.get_context('spawn')
+    )
+
+def replace_decode_pool(broken_pool):
+    """Replace a pool whose worker died, once however many requests saw it"""
+    global decode_pool
+    if decode_pool is broken_pool:
+        print("Decode worker died, starting a new decode pool")
+        decode_pool = create_decode_pool()
+        broken_pool.shutdown(wait=False)
+
+async def read_upload(file: UploadFile):
+    """Read an upload in chunks, returning None as soon as it exceeds the limit"""
+    if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+        return None
+    
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            return None
+        chunks.append(chunk)
+    return b''.join(chunks)
+
 @app.on_event("startup")
 async def startup_event():
     """Load model on startup"""
+    global decode_pool
+    decode_pool = create_decode_pool()
+    
     print("Starting up - loading model...")
     try:
         load_model()
@@ -73,6 +182,12 @@ async def startup_event():
         print(f"WARNING: Failed to load model on startup: {e}")
         print("Model will be loaded on first prediction request")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the decode workers"""
+    if decode_pool is not None:
+        decode_pool.shutdown(cancel_futures=True)
+
 @app.get("/", response_class=HTMLResponse)
 async def root():
     return """
@@ -550,15 +665,27 @@ async def predict(file: UploadFile = File(...)):
         }
     
     try:
-        # Read image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents)).convert('L')
+        # Read image, giving up as soon as it is over the size limit
+        contents = await read_upload(file)
+        if contents is None:
+            return upload_too_large()
         
-        # Resize to 28x28
-        image = image.resize((28, 28), Image.Resampling.LANCZOS)
-        
-        # Convert to array and normalize (NO INVERSION)
-        image_array = np.array(image).astype('float32') / 255.0
+        # Decode and resize to 28x28 in a worker process, off the event loop
+        loop = asyncio.get_running_loop()
+        pool = decode_pool
+        try:
+            image_array = await loop.run_in_executor(
+                pool, decode_digit, contents, MAX_IMAGE_PIXELS
+            )
+        except (ImageTooLarge, Image.DecompressionBombError) as e:
+            return JSONResponse(status_code=413, content={"success": False, "error": str(e)})
+        except BrokenProcessPool:
+            # A worker was killed (usually out of memory); later requests get a new pool
+            replace_decode_pool(pool)
+            return JSONResponse(status_code=503, content={
+                "success": False,
+                "error": "Image decoding failed, please retry with a smaller image"
+            })
         image_array = image_array.reshape(1, 28, 28, 1)
         
         # Make prediction
@@ -593,5 +720,6 @@ async def model_info():
         "classes": list(range(10)),
         "input_size": "28x28 grayscale images",
         "framework": "TensorFlow/Keras",
+        "model_format": model_format,
         "deployment": "MLOps Pipeline via GitHub Actions"
     }
\ No newline at end of file
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+import numpy as np
+import tensorflow as tf
+
+# Serving artifact: architecture/signature descriptor + flat, mmap-able weights
+SERVING_DESCRIPTOR = 'model.serving.json'
+SERVING_WEIGHTS = 'model.weights.bin'
+# Size, mtime and checksum of the last verified weights file
+VERIFIED_STAMP = 'model.weights.verified.json'
+FORMAT_VERSION = 1
+# Align every weight so memory-mapped views are aligned like regular arrays
+ALIGNMENT = 64
+
+def file_sha256(path):
+    """
+    SHA-256 of a file, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _file_stat(path):
+    stat = Path(path).stat()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def _write_stamp(model_dir, weights_path, sha256):
+    """
+    Record that the weights file with this size and mtime has this checksum
+    (skipped when the model folder is read-only)
+    """
+    try:
+        with open(Path(model_dir) / VERIFIED_STAMP, 'w') as f:
+            json.dump(dict(_file_stat(weights_path), sha256=sha256), f)
+    except OSError:
+        pass
+
+def verify_weights(model_dir, weights_path, sha256):
+    """
+    Check the weights file against its checksum
+
+    The file is only hashed when its size or mtime differ from the last
+    verified ones, so a pod restart does not re-read the whole file.
+    """
+    stamp_path = Path(model_dir) / VERIFIED_STAMP
+    if stamp_path.exists():
+        with open(stamp_path) as f:
+            stamp = json.load(f)
+        if stamp == dict(_file_stat(weights_path), sha256=sha256):
+            return
+
+    if file_sha256(weights_path) != sha256:
+        raise ValueError(f"Checksum mismatch for {weights_path}")
+    _write_stamp(model_dir, weights_path, sha256)
+
+def verify_artifact(model_dir):
+    """
+    Verify the serving artifact in `model_dir`, if any, and record its stamp
+
+    Run once when building the image, so pods start with a matching stamp.
+    """
+    model_dir = Path(model_dir)
+    if not (model_dir / SERVING_DESCRIPTOR).exists():
+        return
+    with open(model_dir / SERVING_DESCRIPTOR) as f:
+        descriptor = json.load(f)
+    verify_weights(model_dir, model_dir / descriptor['weights_file'], descriptor['sha256'])
+
+def _signature(tensors):
+    return [
+        {'name': t.name, 'shape': list(t.shape), 'dtype': t.dtype.name}
+        for t in tensors
+    ]
+
+def export_serving_artifact(model, output_dir):
+    """
+    Write the serving artifact for `model` next to model.keras
+
+    The descriptor is written last, so a folder without one never has a
+    half-written artifact that the server would try to load.
+    """
+    output_dir = Path(output_dir)
+    weights_path = output_dir / SERVING_WEIGHTS
+
+    entries = []
+    offset = 0
+    with open(weights_path, 'wb') as f:
+        for weight in model.get_weights():
+            weight = np.ascontiguousarray(weight)
+            padding = -offset % ALIGNMENT
+            f.write(b'\0' * padding)
+            offset += padding
+            f.write(weight.tobytes())
+            entries.append({'shape': list(weight.shape), 'dtype': weight.dtype.str, 'offset': offset})
+            offset += weight.nbytes
+
+    descriptor = {
+        'format_version': FORMAT_VERSION,
+        'architecture': json.loads(model.to_json()),
+        'inputs': _signature(model.inputs),
+        'outputs': _signature(model.outputs),
+        'weights_file': SERVING_WEIGHTS,
+        'weights': entries,
+        'sha256': file_sha256(weights_path)
+    }
+    _write_stamp(output_dir, weights_path, descriptor['sha256'])
+    tmp_path = output_dir / f'{SERVING_DESCRIPTOR}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(descriptor, f)
+    os.replace(tmp_path, output_dir / SERVING_DESCRIPTOR)
+
+    return output_dir / SERVING_DESCRIPTOR
+
+def load_serving_artifact(model_dir, verify=True):
+    """
+    Rebuild the model from its descriptor and assign the weights from a
+    memory map of the weights file
+
+    The architecture is still rebuilt by Keras (model_from_json); what is
+    saved compared to model.keras is unzipping and parsing the HDF5 weights.
+    Each weight is copied once, from the mapped file into its variable.
+    """
+    model_dir = Path(model_dir)
+    with open(model_dir / SERVING_DESCRIPTOR) as f:
+        descriptor = json.load(f)
+
+    if descriptor.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported serving artifact version {descriptor.get('format_version')}")
+
+    weights_path = model_dir / descriptor['weights_file']
+    if verify:
+        verify_weights(model_dir, weights_path, descriptor['sha256'])
+
+    model = tf.keras.models.model_from_json(json.dumps(descriptor['architecture']))
+    if len(model.weights) != len(descriptor['weights']):
+        raise ValueError(f"Descriptor lists {len(descriptor['weights'])} weights, "
+                         f"the model has {len(model.weights)}")
+
+    buffer = np.memmap(weights_path, dtype=np.uint8, mode='r')
+    for variable, entry in zip(model.weights, descriptor['weights']):
+        value = np.ndarray(tuple(entry['shape']), dtype=np.dtype(entry['dtype']),
+                           buffer=buffer, offset=entry['offset'])
+        variable.assign(value)
+    del buffer
+
+    return model
+
+def verify_round_trip(model, model_dir, sample, atol=1e-5):
+    """
+    Load the exported artifact back and check it predicts like `model`
+
+    Both models are called directly rather than through predict(): under a
+    multi-worker strategy predict() gathers outputs across workers, which
+    hangs when only the chief runs this check.
+    """
+    loaded = load_serving_artifact(model_dir)
+    expected = np.asarray(model(sample, training=False))
+    actual = np.asarray(loaded(sample, training=False))
+    if not np.allclose(expected, actual, atol=atol):
+        raise ValueError(f"Serving artifact in {model_dir} predicts differently "
+                         f"(max diff {np.abs(expected - actual).max():.2e})")
+
+def load_model(model_dir):
+    """
+    Load the model to serve, preferring the serving artifact
+
+    Returns (model, format) where format is 'serving' or 'keras'. Falls back
+    to model.keras when the artifact is missing, outdated or corrupt.
+    """
+    model_dir = Path(model_dir)
+
+    if (model_dir / SERVING_DESCRIPTOR).exists():
+        try:
+            return load_serving_artifact(model_dir), 'serving'
+        except Exception as e:
+            print(f"Serving artifact unusable, falling back to model.keras: {e}")
+
+    model_path = model_dir / 'model.keras'
+    if not model_path.exists():
+        raise FileNotFoundError(f"Model file not found at {model_path}")
+
+    return tf.keras.models.load_model(model_path), 'keras'
@@ -0,0 +1,277 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import yaml
+
+import shm_arrays
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+REFERENCE = re.compile(r'\$\{\{\s*([\w.]+)\s*\}\}')
+OPTIONAL_BLOCK = re.compile(r'\$\[\[(.*?)\]\]')
+
+def load_components():
+    """
+    Map component names to their local specifications under components/
+    """
+    components = {}
+    for spec_path in sorted(REPO_ROOT.glob('components/*/*.yaml')):
+        with open(spec_path) as f:
+            spec = yaml.safe_load(f)
+        spec['_path'] = spec_path
+        components[spec['name']] = spec
+    return components
+
+def component_name(reference):
+    """
+    `azureml:mnist_training@latest` -> `mnist_training`
+    """
+    return reference.split(':', 1)[-1].split('@')[0]
+
+def job_order(jobs):
+    """
+    Topological order of the pipeline jobs from their ${{parent.jobs...}} inputs
+    """
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order:
+            return
+        if name in visiting:
+            raise ValueError(f"Cycle in pipeline at job '{name}'")
+        visiting.add(name)
+        for value in jobs[name].get('inputs', {}).values():
+            match = REFERENCE.fullmatch(str(value))
+            if match and match.group(1).startswith('parent.jobs.'):
+                visit(match.group(1).split('.')[2])
+        visiting.discard(name)
+        order.append(name)
+
+    for name in jobs:
+        visit(name)
+    return order
+
+def fingerprint_path(path):
+    """
+    Cheap fingerprint of an external input folder: names, sizes and mtimes
+    """
+    digest = hashlib.sha256()
+    path = Path(path)
+    files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+    for file in files:
+        stat = file.stat()
+        digest.update(f'{file.relative_to(path.parent)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+def fingerprint_job(component, inputs, upstream):
+    """
+    Hash of everything a step's outputs depend on: component spec and code,
+    literal inputs, external input folders and upstream step fingerprints
+    """
+    digest = hashlib.sha256()
+    digest.update(component['_path'].read_bytes())
+    code_dir = component['_path'].parent / component['code']
+    for file in sorted(p for p in code_dir.rglob('*.py')):
+        digest.update(file.read_bytes())
+    for include in component.get('additional_includes', []):
+        digest.update((component['_path'].parent / include).read_bytes())
+
+    for name, value in sorted(inputs.items()):
+        if name in upstream:
+            digest.update(f'{name}={upstream[name]}'.encode())
+        elif component['inputs'][name]['type'] == 'uri_folder':
+            digest.update(f'{name}={fingerprint_path(value)}'.encode())
+        else:
+            digest.update(f'{name}={value!r}'.encode())
+    return digest.hexdigest()[:16]
+
+def render_command(command, inputs, outputs):
+    """
+    Substitute ${{inputs.x}}/${{outputs.y}}; drop $[[...]] blocks whose
+    inputs were not provided, like Azure ML does for optional inputs
+    """
+    values = {f'inputs.{k}': v for k, v in inputs.items()}
+    values.update({f'outputs.{k}': v for k, v in outputs.items()})
+
+    def optional(match):
+        names = REFERENCE.findall(match.group(1))
+        return match.group(1) if all(values.get(n) is not None for n in names) else ''
+
+    command = OPTIONAL_BLOCK.sub(optional, command)
+    return REFERENCE.sub(lambda m: shlex.quote(str(values[m.group(1)])), command)
+
+def run_step(name, component, inputs, outputs, log_path):
+    """
+    Run a component's command in its code folder, with array outputs going
+    to shared memory; returns the exit code
+    """
+    command = shlex.split(render_command(component['command'], inputs, outputs))
+    if command[0] != 'python':
+        raise ValueError(f"Job '{name}': only python commands can run locally")
+
+    env = os.environ.copy()
+    env['SHM_OUTPUT_DIRS'] = os.pathsep.join(str(p) for p in outputs.values())
+    # Azure ML copies additional_includes into the code folder; put them on the path instead
+    include_dirs = [str((component['_path'].parent / include).resolve().parent)
+                    for include in component.get('additional_includes', [])]
+    env['PYTHONPATH'] = os.pathsep.join(include_dirs + [p for p in [env.get('PYTHONPATH')] if p])
+    env.pop('TF_CONFIG', None)  # distributed jobs run as a single worker locally
+
+    code_dir = component['_path'].parent / component['code']
+    print(f"  $ {' '.join(command)}")
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen(
+            [sys.executable, str(Path(shm_arrays.__file__).resolve()), *command[1:]],
+            cwd=code_dir, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True
+        )
+        for line in process.stdout:
+            log.write(line)
+            print(f"  [{name}] {line}", end='')
+        return process.wait()
+
+def save_to_cache(outputs, cache_dir):
+    """
+    Persist a step's outputs (files and shared memory arrays) to the cache
+
+    This writes the shared memory arrays to disk as .npy files, so later runs
+    can reuse them; with --no_cache nothing is written.
+    """
+    tmp_dir = cache_dir.with_name(cache_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for output_name, output_dir in outputs.items():
+        target = tmp_dir / output_name
+        shutil.copytree(output_dir, target, ignore=shutil.ignore_patterns(shm_arrays.MANIFEST))
+        shm_arrays.materialize(output_dir, target)
+    os.replace(tmp_dir, cache_dir)
+
+def print_report(timings, total):
+    print("\n" + "=" * 60)
+    print("Step timings")
+    print("=" * 60)
+    print(f"{'step':<16}{'status':<10}{'seconds':>10}{'share':>10}")
+    for step in timings:
+        share = step['seconds'] / total if total else 0.0
+        print(f"{step['job']:<16}{step['status']:<10}{step['seconds']:>10.1f}{share:>10.0%}")
+    print(f"{'total':<26}{total:>10.1f}")
+
+def main(args):
+    """
+    Run the Azure ML pipeline graph locally, step by step
+    """
+    with open(args.pipeline) as f:
+        pipeline = yaml.safe_load(f)
+    components = load_components()
+    parent_inputs = dict(item.split('=', 1) for item in args.input)
+
+    # The pid keeps runs started within the same second apart
+    run_dir = Path(args.work_dir) / 'runs' / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+    cache_root = Path(args.work_dir) / 'cache'
+    run_dir.mkdir(parents=True)
+    cache_root.mkdir(parents=True, exist_ok=True)
+    print(f"Local run in {run_dir}")
+
+    jobs = pipeline['jobs']
+    job_outputs = {}
+    fingerprints = {}
+    timings = []
+    exit_code = 0
+    start = time.perf_counter()
+
+    try:
+        for name in job_order(jobs):
+            job = jobs[name]
+            component = components[component_name(job['component'])]
+
+            # Resolve inputs: component defaults, then job values and references
+            inputs = {k: v.get('default') for k, v in component.get('inputs', {}).items()}
+            upstream = {}
+            for input_name, value in job.get('inputs', {}).items():
+                match = REFERENCE.fullmatch(str(value))
+                if match and match.group(1).startswith('parent.jobs.'):
+                    _, _, source_job, _, output_name = match.group(1).split('.')
+                    inputs[input_name] = job_outputs[source_job][output_name]
+                    upstream[input_name] = fingerprints[source_job]
+                elif match and match.group(1).startswith('parent.inputs.'):
+                    parent_name = match.group(1).split('.')[2]
+                    if parent_name not in parent_inputs:
+                        raise ValueError(f"Pass a local path for '{parent_name}' with --input {parent_name}=PATH")
+                    inputs[input_name] = str(Path(parent_inputs[parent_name]).resolve())
+                else:
+                    inputs[input_name] = value
+
+            fingerprint = fingerprint_job(component, inputs, upstream)
+            fingerprints[name] = fingerprint
+            cache_dir = cache_root / f'{name}-{fingerprint}'
+
+            print(f"\n▶ {name} ({component['name']}, fingerprint {fingerprint})")
+            step_start = time.perf_counter()
+
+            if cache_dir.exists() and not args.no_cache:
+                job_outputs[name] = {o: str(cache_dir / o) for o in component.get('outputs', {})}
+                status = 'cached'
+            else:
+                outputs = {o: run_dir / name / o for o in component.get('outputs', {})}
+                for output_dir in outputs.values():
+                    output_dir.mkdir(parents=True)
+                job_outputs[name] = {o: str(p.resolve()) for o, p in outputs.items()}
+
+                exit_code = run_step(name, component, inputs, job_outputs[name], run_dir / f'{name}.log')
+                status = 'ran' if exit_code == 0 else 'failed'
+                if exit_code == 0 and not args.no_cache:
+                    save_to_cache(outputs, cache_dir)
+
+            timings.append({'job': name, 'status': status, 'fingerprint': fingerprint,
+                            'seconds': time.perf_counter() - step_start})
+            if exit_code:
+                print(f"\n❌ Job '{name}' failed with exit code {exit_code}, see {run_dir / f'{name}.log'}")
+                break
+    finally:
+        for job_dir in run_dir.glob('*/*'):
+            shm_arrays.unlink_all(job_dir)
+
+    total = time.perf_counter() - start
+    print_report(timings, total)
+    with open(run_dir / 'timings.json', 'w') as f:
+        json.dump({'steps': timings, 'total_seconds': total, 'outputs': job_outputs}, f, indent=2)
+
+    return exit_code
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the MNIST pipeline locally on one machine")
+
+    parser.add_argument(
+        "--pipeline",
+        type=str,
+        default=str(REPO_ROOT / 'pipelines' / 'mnist-classification.yaml'),
+        help="Pipeline definition to run"
+    )
+    parser.add_argument(
+        "--input",
+        action="append",
+        default=[],
+        metavar="NAME=PATH",
+        help="Local path for a pipeline input, e.g. raw_data=./data"
+    )
+    parser.add_argument(
+        "--work_dir",
+        type=str,
+        default=str(REPO_ROOT / '.local_runs'),
+        help="Folder for run outputs, logs and the step cache"
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Rerun every step and keep arrays in shared memory only (no cache written)"
+    )
+
+    args = parser.parse_args()
+    sys.exit(main(args))
@@ -0,0 +1,133 @@
+"""
+Pass numpy arrays between local pipeline steps through shared memory
+
+Run as `python shm_arrays.py SCRIPT [ARGS...]` to execute a component script
+with `np.save`/`np.load` redirected: arrays saved into one of the step's
+output folders (SHM_OUTPUT_DIRS) go to POSIX shared memory instead of disk,
+and a `.shm.json` manifest in that folder tells later steps where to find
+them. Component scripts need no changes; files other than arrays (models,
+reports) are still written to disk.
+
+Arrays loaded from shared memory are read-only, like `np.load(...,
+mmap_mode='r')`: a step that modifies its input in place must copy it first
+(`np.array(x)`), otherwise numpy raises "assignment destination is read-only".
+"""
+import json
+import os
+import runpy
+import sys
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+from pathlib import Path
+import numpy as np
+
+MANIFEST = '.shm.json'
+
+_real_save = np.save
+_real_load = np.load
+# Keep attached blocks alive as long as the arrays viewing them
+_attached = []
+
+def _untrack(shm):
+    """
+    Stop this process's resource tracker from unlinking the block on exit;
+    the local runner owns the block's lifetime
+    """
+    resource_tracker.unregister(shm._name, 'shared_memory')
+
+def read_manifest(directory):
+    path = Path(directory) / MANIFEST
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def put_array(path, array):
+    """
+    Copy `array` into a new shared memory block registered under `path`
+    """
+    path = Path(path)
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1), name=f'mnist_{uuid.uuid4().hex[:16]}')
+    _untrack(shm)
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    shm.close()
+
+    manifest = read_manifest(path.parent)
+    manifest[path.name] = {'name': shm.name, 'shape': list(array.shape), 'dtype': array.dtype.str}
+    with open(path.parent / MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def get_array(path):
+    """
+    Read-only view on the shared memory array registered under `path`,
+    or None when it is not in shared memory
+
+    The block is shared with other steps, so writing is disabled; copy the
+    array to modify it.
+    """
+    path = Path(path)
+    entry = read_manifest(path.parent).get(path.name)
+    if entry is None:
+        return None
+    shm = shared_memory.SharedMemory(name=entry['name'])
+    _untrack(shm)
+    _attached.append(shm)
+    array = np.ndarray(tuple(entry['shape']), dtype=np.dtype(entry['dtype']), buffer=shm.buf)
+    array.flags.writeable = False
+    return array
+
+def unlink_all(directory):
+    """
+    Free every shared memory block listed in a folder's manifest
+    """
+    for entry in read_manifest(directory).values():
+        try:
+            # Attaching registers with the tracker, unlink() unregisters
+            shm = shared_memory.SharedMemory(name=entry['name'])
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def materialize(directory, target):
+    """
+    Write a folder's shared memory arrays to `target` as regular .npy files
+    """
+    for filename in read_manifest(directory):
+        array = get_array(Path(directory) / filename)
+        _real_save(Path(target) / filename, array)
+
+def _is_path(file):
+    return isinstance(file, (str, os.PathLike))
+
+def _save(file, arr, *args, **kwargs):
+    if _is_path(file):
+        path = Path(file)
+        if path.suffix != '.npy':
+            path = path.with_name(path.name + '.npy')
+        output_dirs = [Path(d).resolve() for d in os.environ.get('SHM_OUTPUT_DIRS', '').split(os.pathsep) if d]
+        if path.parent.resolve() in output_dirs:
+            put_array(path, arr)
+            return
+    return _real_save(file, arr, *args, **kwargs)
+
+def _load(file, *args, **kwargs):
+    if _is_path(file):
+        array = get_array(file)
+        if array is not None:
+            return array
+    return _real_load(file, *args, **kwargs)
+
+def run_script(script, argv):
+    """
+    Run a component script as __main__ with the shared memory numpy hooks
+    """
+    np.save = _save
+    np.load = _load
+    sys.argv = [script, *argv]
+    sys.path.insert(0, str(Path(script).resolve().parent))
+    runpy.run_path(script, run_name='__main__')
+
+if __name__ == "__main__":
+    run_script(sys.argv[1], sys.argv[2:])